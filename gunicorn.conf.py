@@ -0,0 +1,24 @@
+'''
+gunicorn settings for the ISS tracker: `gunicorn -c gunicorn.conf.py wsgi:app`
+'''
+
+import os
+
+bind = '0.0.0.0:5000'
+worker_class = 'gthread'
+workers = max(2, os.cpu_count() or 1)
+threads = 4
+
+# Import the app (and warm its cache) once in the master so the parsed data is
+# shared copy-on-write by the forked workers.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while preloading must not be shared
+    # between workers; drop them so each worker opens its own.
+    import iss_tracker
+    iss_tracker._http = iss_tracker._make_http_client()
+
+    # Threads do not survive fork, so each worker starts its own refresher.
+    iss_tracker.start_refresher()
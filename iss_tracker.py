@@ -1,21 +1,103 @@
 #!/usr/bin/env python3
 
+import contextlib
+import functools
+import io
+import sqlite3
+import threading
 import time
+import numpy as np
+import orjson
+from numba import njit
 from astropy import coordinates as coord
 from astropy import units as u
 from astropy.time import Time
-import requests
+import erfa
+import httpx
 import xmltodict
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
 import pprint
 import logging
 from datetime import datetime
 import math
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify
+from werkzeug.http import unquote_etag
 
 from geopy.geocoders import Nominatim
 
 app = Flask(__name__)
 
+# State vector components that are converted to floats while parsing.
+NUMERIC_FIELDS = frozenset({'X', 'Y', 'Z', 'X_DOT', 'Y_DOT', 'Z_DOT'})
+
+ISS_DATA_URL = 'https://nasa-public-data.s3.amazonaws.com/iss-coords/current/ISS_OEM/ISS.OEM_J2K_EPH.xml'
+
+# The OEM file is regenerated every few minutes, so within this window the
+# cached copy is served without touching the network at all.
+CACHE_TTL_SECONDS = 60
+
+# How often the background refresher revalidates the OEM file. Kept below the
+# TTL so that, while it runs, requests never have to refresh the data themselves.
+REFRESH_INTERVAL_SECONDS = 50
+
+# After a failed fetch, requests keep serving the cached copy for this long
+# instead of each retrying the upstream themselves.
+FAILURE_BACKOFF_SECONDS = 30
+
+def _make_http_client() -> httpx.Client:
+    """
+    Creates the HTTP client used to download the OEM file. It is reused across fetches so the
+    HTTP/2 connection (and its TLS session) stays open, and it asks for a compressed body.
+    """
+    return httpx.Client(http2=True, timeout=10, headers={'Accept-Encoding': 'gzip, deflate'},
+                        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4))
+
+_http = _make_http_client()
+
+# The current OEM data and everything derived from it. A refresh builds a
+# complete new dict and swaps it in, so a reader that takes _CACHE once always
+# sees a consistent snapshot.
+_CACHE = {
+    'etag': None,
+    'last_modified': None,
+    'xml': None,
+    'table': None,
+    'epoch_index': None,
+    'comment_json': None,
+    'header_json': None,
+    'metadata_json': None,
+    'fetched_at': 0,
+    'failed_at': None,
+}
+
+# One record per state vector. The OEM fields keep their names and full
+# precision since /epochs serves them back verbatim, and speed stays float64
+# because it is served as is. The location columns are float32:
+# near +/-180 degrees float32 steps are about 1.5e-5 degrees (roughly 1.7 m of
+# longitude), still finer than the ephemeris, but only the digits float32
+# actually holds are served (see record_location).
+STATE_VECTOR_DTYPE = np.dtype([
+    ('EPOCH', 'U24'),
+    ('X', 'f8'), ('Y', 'f8'), ('Z', 'f8'),
+    ('X_DOT', 'f8'), ('Y_DOT', 'f8'), ('Z_DOT', 'f8'),
+    ('epoch_dt', 'M8[s]'),
+    ('speed', 'f8'),
+    ('latitude', 'f4'), ('longitude', 'f4'), ('altitude', 'f4'),
+])
+
+# Reverse geocoding is done on a grid of this many degrees so that nearby
+# epochs share one Nominatim lookup.
+GEOCODE_GRID_DEGREES = 0.05
+GEOCACHE_PATH = 'geocache.db'
+
+# Serializes refreshes so concurrent threads never download or parse the same data twice.
+_refresh_lock = threading.Lock()
+
+_geocoder = Nominatim(user_agent='iss_tracker')
+
 
 '''
 Utility Functions:
@@ -33,28 +115,153 @@ def calculate_speed(x_velocity: float, y_velocity: float, z_velocity: float) ->
     Returns:
         float: The magnitude of velocity (speed) calculated using the Euclidean distance formula.
     """
-    speed = math.sqrt(x_velocity ** 2 + y_velocity ** 2 + z_velocity ** 2)
+    speed = math.hypot(x_velocity, y_velocity, z_velocity)
     return speed
 
+def _is_current(cache: dict, max_age: float) -> bool:
+    """
+    Tells whether a cache snapshot holds data fetched less than max_age seconds ago, or whose
+    last fetch attempt failed less than FAILURE_BACKOFF_SECONDS (capped at max_age) ago.
+    """
+    if cache['xml'] is None:
+        return False
+
+    now = time.monotonic()
+    if now - cache['fetched_at'] < max_age:
+        return True
+    return cache['failed_at'] is not None and now - cache['failed_at'] < min(max_age, FAILURE_BACKOFF_SECONDS)
+
+def _refresh_cache(max_age: float = 0, blocking: bool = True) -> None:
+    """
+    Revalidates the OEM data with a conditional GET (If-None-Match / If-Modified-Since). When the
+    file has changed it is parsed completely and a new cache snapshot is swapped in.
+
+    Args:
+        max_age (float): Skip the request if the cached copy was fetched less than this many seconds ago.
+        blocking (bool): If False and another thread is already refreshing, return at once and leave
+            the current snapshot in place. Ignored while nothing has been fetched yet.
+    """
+    global _CACHE
+
+    # Checked before taking the lock so that readers of a fresh cache never
+    # wait behind a refresh that is downloading and parsing a new file.
+    if _is_current(_CACHE, max_age):
+        return
+    if not _refresh_lock.acquire(blocking=blocking or _CACHE['xml'] is None):
+        return
+
+    try:
+        cache = _CACHE
+        if _is_current(cache, max_age):
+            return
+
+        headers = {}
+        if cache['etag'] is not None:
+            headers['If-None-Match'] = cache['etag']
+        if cache['last_modified'] is not None:
+            headers['If-Modified-Since'] = cache['last_modified']
+
+        try:
+            response = _http.get(ISS_DATA_URL, headers=headers)
+        except httpx.HTTPError:
+            _CACHE = {**cache, 'failed_at': time.monotonic()}
+            raise
+        status_code = response.status_code
+
+        if status_code == 304:
+            logger.info("Data not modified, using cached copy")
+            _CACHE = {**cache, 'fetched_at': time.monotonic(), 'failed_at': None}
+            return
+
+        if status_code == 200:
+            logger.info("Successfully fetched data")
+        else:
+            logger.error("Failed to fetch data")
+            _CACHE = {**cache, 'failed_at': time.monotonic()}
+            return
+
+        full_data_xml = response.content
+        snapshot = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'xml': full_data_xml,
+            'fetched_at': time.monotonic(),
+            'failed_at': None,
+        }
+        try:
+            snapshot.update(_parse_to_table(full_data_xml))
+        except Exception:
+            # A truncated or malformed download is a failed fetch too: keep
+            # serving the previous snapshot and back off before retrying.
+            _CACHE = {**cache, 'failed_at': time.monotonic()}
+            raise
+        _CACHE = snapshot
+    finally:
+        _refresh_lock.release()
+
+def _refresher() -> None:
+    """
+    Keeps the cached OEM data up to date; runs forever in a daemon thread.
+    """
+    while True:
+        try:
+            _refresh_cache()
+        except Exception:
+            logger.exception("Background refresh of ISS data failed")
+        time.sleep(REFRESH_INTERVAL_SECONDS)
+
+def start_refresher() -> threading.Thread:
+    """
+    Starts the background thread that revalidates the OEM data every REFRESH_INTERVAL_SECONDS,
+    so requests are served from memory instead of waiting on NASA.
+
+    Returns:
+        threading.Thread: The started daemon thread.
+    """
+    thread = threading.Thread(target=_refresher, name='iss-data-refresher', daemon=True)
+    thread.start()
+    return thread
+
 def fetch_iss_data() -> bytes:
     """
     Fetches International Space Station (ISS) coordinates data from a public API provided by NASA.
 
+    The download is cached in memory and normally kept fresh by the background refresher. If the
+    cached copy is older than CACHE_TTL_SECONDS it is revalidated before returning, unless a
+    refresh is already running, in which case the current copy is returned without waiting.
+
     Returns:
-        bytes: The raw XML data downloaded from the API.
+        bytes: The raw XML data downloaded from the API, or None if it has never been fetched successfully.
     """
-    response = requests.get(url='https://nasa-public-data.s3.amazonaws.com/iss-coords/current/ISS_OEM/ISS.OEM_J2K_EPH.xml')
-    status_code = response.status_code
+    try:
+        _refresh_cache(max_age=CACHE_TTL_SECONDS, blocking=False)
+    except Exception:
+        logger.exception("Failed to fetch data")
 
-    if status_code == 200:
-        logger.info("Successfully fetched data")
-    else:
-        logger.error("Failed to fetch data")
-        return None
+    return _current_snapshot()['xml']
 
-    full_data_xml = response.content
+def _current_snapshot() -> dict:
+    """
+    Returns the cache snapshot to read from. Inside a request the first call pins the snapshot in
+    flask.g, so the route and its cache headers all see the same version of the data even if the
+    refresher swaps in a newer one meanwhile. Outside a request it is the latest snapshot.
+    """
+    if not has_request_context():
+        return _CACHE
+    if 'snapshot' not in g:
+        g.snapshot = _CACHE
+    return g.snapshot
 
-    return full_data_xml
+def _snapshot_for(xml_data: bytes) -> dict:
+    """
+    Returns the cached snapshot holding exactly this XML body, or None if it is not cached.
+    """
+    if xml_data is None:
+        return None
+    for cache in (_current_snapshot(), _CACHE):
+        if xml_data is cache['xml']:
+            return cache
+    return None
 
 def parse_xml_data(full_data_xml: bytes) -> dict:
     """
@@ -66,10 +273,225 @@ def parse_xml_data(full_data_xml: bytes) -> dict:
     Returns:
         dict: The XML data converted to a dictionary.
     """
-    full_data_dicts = xmltodict.parse(full_data_xml)
+    full_data_dicts = xmltodict.parse(full_data_xml, dict_constructor=dict, xml_attribs=False,
+                                      force_list=('stateVector',), postprocessor=_convert_numeric)
     return full_data_dicts
 
-def extract_state_vector(xml_data: bytes) -> list:
+def _convert_numeric(path: list, key: str, value):
+    """
+    xmltodict postprocessor that turns state vector components into floats as they are parsed.
+    """
+    if key in NUMERIC_FIELDS and value is not None:
+        return key, float(value)
+    return key, value
+
+def _load_sections(full_data_xml: bytes) -> dict:
+    """
+    Returns the comment, header and metadata sections of the XML data encoded as JSON,
+    reusing the cached encoding for the cached download.
+    """
+    cache = _snapshot_for(full_data_xml)
+    if cache is not None:
+        return cache
+
+    return _encode_sections(_read_oem(full_data_xml)[0])
+
+def _encode_sections(sections: dict) -> dict:
+    """
+    Encodes the comment, header and metadata sections read by _read_oem as JSON.
+    """
+    return {
+        'comment_json': orjson.dumps(sections['COMMENT']),
+        'header_json': orjson.dumps(sections['header']),
+        'metadata_json': orjson.dumps(sections['metadata']),
+    }
+
+def _element_to_dict(elem):
+    """
+    Converts an lxml element the way parse_xml_data would: leaf elements become their stripped
+    text (None if empty), repeated child tags become lists, and attributes are dropped.
+    """
+    children = [child for child in elem if isinstance(child.tag, str)]
+    if not children:
+        text = (elem.text or '').strip()
+        return text or None
+
+    result = {}
+    for child in children:
+        value = _element_to_dict(child)
+        if child.tag not in result:
+            result[child.tag] = value
+        elif isinstance(result[child.tag], list):
+            result[child.tag].append(value)
+        else:
+            result[child.tag] = [result[child.tag], value]
+    return result
+
+def _read_oem(xml_data: bytes) -> tuple:
+    """
+    Reads the header, metadata and data COMMENT sections and the epoch, position and velocity
+    of every state vector in the XML data, in a single pass.
+
+    The file is streamed with lxml when it is installed; otherwise it falls back to
+    parse_xml_data, whose postprocessor already yields the components as floats.
+
+    Args:
+        xml_data (bytes): The raw XML data containing ISS position and velocity information.
+
+    Returns:
+        tuple: A dict of the 'header', 'metadata' and 'COMMENT' sections as parse_xml_data would
+        return them, followed by seven lists (epoch, x, y, z, x_dot, y_dot, z_dot), one entry
+        per state vector.
+    """
+    sections = {'header': None, 'metadata': None, 'COMMENT': None}
+    epochs = []
+    x, y, z = [], [], []
+    x_dot, y_dot, z_dot = [], [], []
+
+    if etree is None:
+        oem = parse_xml_data(xml_data)['ndm']['oem']
+        segment = oem['body']['segment']
+        sections['header'] = oem.get('header')
+        sections['metadata'] = segment.get('metadata')
+        sections['COMMENT'] = segment['data'].get('COMMENT')
+        for item in segment['data'].get('stateVector', []):
+            epochs.append(item['EPOCH'])
+            x.append(item['X'])
+            y.append(item['Y'])
+            z.append(item['Z'])
+            x_dot.append(item['X_DOT'])
+            y_dot.append(item['Y_DOT'])
+            z_dot.append(item['Z_DOT'])
+        return sections, epochs, x, y, z, x_dot, y_dot, z_dot
+
+    comments = []
+    for _, elem in etree.iterparse(io.BytesIO(xml_data), events=('end',),
+                                   tag=('header', 'metadata', 'COMMENT', 'stateVector')):
+        if elem.tag == 'COMMENT':
+            # Only the comments directly under <data> form the /comment section
+            if elem.getparent().tag == 'data':
+                comments.append(_element_to_dict(elem))
+            continue
+        if elem.tag != 'stateVector':
+            sections[elem.tag] = _element_to_dict(elem)
+            continue
+
+        epochs.append(elem.find('EPOCH').text)
+        x.append(float(elem.find('X').text))
+        y.append(float(elem.find('Y').text))
+        z.append(float(elem.find('Z').text))
+        x_dot.append(float(elem.find('X_DOT').text))
+        y_dot.append(float(elem.find('Y_DOT').text))
+        z_dot.append(float(elem.find('Z_DOT').text))
+
+        # Drop the processed element and its predecessors so memory stays flat
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    if comments:
+        sections['COMMENT'] = comments[0] if len(comments) == 1 else comments
+    return sections, epochs, x, y, z, x_dot, y_dot, z_dot
+
+@functools.lru_cache(maxsize=16384)
+def _parse_epoch(epoch: str) -> datetime:
+    """
+    Parses an OEM epoch such as '2024-080T12:00:00.000Z'. Consecutive OEM files share almost all
+    of their epochs, so after the first download nearly every call is a cache hit.
+    """
+    return datetime.strptime(epoch[:-5], '%Y-%jT%H:%M:%S')
+
+def _parse_to_table(xml_data: bytes) -> dict:
+    """
+    Parses the state vectors in the XML data into a single structured NumPy array.
+
+    Args:
+        xml_data (bytes): The raw XML data containing ISS position and velocity information.
+
+    Returns:
+        dict: 'table' holds one STATE_VECTOR_DTYPE record per state vector, with the speed
+        and geodetic position of the ISS precomputed,
+        'epoch_index' maps each epoch string to its record, and 'comment_json',
+        'header_json' and 'metadata_json' hold the other sections encoded as JSON.
+    """
+    sections, epochs, x, y, z, x_dot, y_dot, z_dot = _read_oem(xml_data)
+
+    table = np.empty(len(epochs), dtype=STATE_VECTOR_DTYPE)
+    table['EPOCH'] = epochs
+    table['epoch_dt'] = [_parse_epoch(epoch) for epoch in epochs]
+
+    # The kernels run on contiguous float64 copies; the results are packed into the table after.
+    columns = [np.asarray(values, dtype=np.float64) for values in (x, y, z, x_dot, y_dot, z_dot)]
+    for name, column in zip(('X', 'Y', 'Z', 'X_DOT', 'Y_DOT', 'Z_DOT'), columns):
+        table[name] = column
+
+    speeds = np.empty(len(epochs), dtype=np.float64)
+    _derived(*columns[3:], speeds)
+    table['speed'] = speeds
+
+    try:
+        table['latitude'], table['longitude'], table['altitude'] = _compute_locations(
+            columns[0], columns[1], columns[2], table['epoch_dt'])
+    except Exception:
+        # get_location_info falls back to transforming single epochs on demand
+        logger.exception("Batch location computation failed")
+        table['latitude'] = table['longitude'] = table['altitude'] = np.nan
+
+    epoch_index = {epoch: index for index, epoch in enumerate(epochs)}
+
+    return {'table': table, 'epoch_index': epoch_index, **_encode_sections(sections)}
+
+# Compiled serially on purpose: a parallel kernel would start numba's threading
+# layer in the gunicorn master, and the GNU OpenMP layer aborts in forked workers.
+# No fastmath either, so each speed is the correctly rounded sum of squares. It
+# can still differ in the last digit from Python's math.sqrt(x ** 2 + ...),
+# whose ** goes through the platform pow() (about 4 in 10,000 velocities).
+@njit(cache=True)
+def _derived(x_dot, y_dot, z_dot, speeds):
+    """
+    Fills the speed of every state vector in one pass.
+    """
+    for i in range(x_dot.shape[0]):
+        speeds[i] = math.sqrt(x_dot[i] * x_dot[i] + y_dot[i] * y_dot[i] + z_dot[i] * z_dot[i])
+
+# Compile the kernel at import so the first parse does not pay for it.
+_derived(*(np.zeros(1) for _ in range(4)))
+
+def _compute_locations(x: np.ndarray, y: np.ndarray, z: np.ndarray, epochs_dt: np.ndarray) -> tuple:
+    """
+    Converts GCRS positions to latitude, longitude and altitude for every epoch in one batch.
+
+    Args:
+        x, y, z (np.ndarray): The GCRS position components in km.
+        epochs_dt (np.ndarray): The epoch of each position as datetime64 values.
+
+    Returns:
+        tuple: Arrays of latitude (deg), longitude (deg) and altitude (km).
+    """
+    if epochs_dt.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty
+
+    # One vectorised transform over all epochs instead of one astropy frame per epoch.
+    obstime = Time(epochs_dt)
+    cartrep = coord.CartesianRepresentation(x, y, z, unit=u.km)
+    gcrs = coord.GCRS(cartrep, obstime=obstime)
+    itrs = gcrs.transform_to(coord.ITRS(obstime=obstime))
+
+    loc = coord.EarthLocation.from_geocentric(*itrs.cartesian.xyz)
+    return loc.lat.value, loc.lon.value, loc.height.to_value(u.km)
+
+def _load_state_vector(xml_data: bytes) -> dict:
+    """
+    Returns the parsed state vector table, reusing the cached one for the cached download.
+    """
+    cache = _snapshot_for(xml_data)
+    if cache is not None:
+        return cache
+
+    return _parse_to_table(xml_data)
+
+def extract_state_vector(xml_data: bytes) -> np.ndarray:
     """
     Extracts state vector information from XML data.
 
@@ -77,11 +499,131 @@ def extract_state_vector(xml_data: bytes) -> list:
         xml_data (bytes): The raw XML data containing ISS position and velocity information.
 
     Returns:
-        list: A list of dictionaries, each representing the state vector of the ISS at different epochs.
+        np.ndarray: A structured array (STATE_VECTOR_DTYPE) with one record per epoch.
+    """
+    return _load_state_vector(xml_data)['table']
+
+def find_epoch_index(xml_data: bytes, epoch: str) -> int:
+    """
+    Looks up the position of an epoch within the state vector table.
+
+    Args:
+        xml_data (bytes): The raw XML data containing ISS position and velocity information.
+        epoch (str): The epoch to look up.
+
+    Returns:
+        int: The index of the epoch, or None if the epoch is not in the data.
+    """
+    return _load_state_vector(xml_data)['epoch_index'].get(epoch)
+
+def state_vector_row(state_vector: np.ndarray, index: int) -> dict:
+    """
+    Builds the dictionary for a single state vector.
+
+    Args:
+        state_vector (np.ndarray): The table returned by extract_state_vector.
+        index (int): The position of the state vector to return.
+
+    Returns:
+        dict: The epoch, position and velocity of the ISS at that index.
+    """
+    record = state_vector[index]
+    return {
+        'EPOCH': str(record['EPOCH']),
+        'X': float(record['X']),
+        'Y': float(record['Y']),
+        'Z': float(record['Z']),
+        'X_DOT': float(record['X_DOT']),
+        'Y_DOT': float(record['Y_DOT']),
+        'Z_DOT': float(record['Z_DOT']),
+    }
+
+@functools.lru_cache(maxsize=1024)
+def _celestial_to_intermediate_matrix(obstime_minute: str) -> np.ndarray:
+    """
+    Returns the IAU 2000B celestial-to-intermediate (precession-nutation) matrix for a time
+    rounded to the minute; it changes far too slowly for the rounding to matter.
+    """
+    tt = Time(obstime_minute, scale='utc').tt
+    return erfa.c2i00b(tt.jd1, tt.jd2)
+
+def _locate(x: float, y: float, z: float, epoch_dt: np.datetime64) -> tuple:
+    """
+    Converts a single GCRS position to latitude, longitude and altitude without building
+    astropy frames, by applying the GCRS to ITRS rotation matrix directly.
+
+    Polar motion (about 10 m at the ISS) is neglected.
+
+    Args:
+        x, y, z (float): The GCRS position components in km.
+        epoch_dt (np.datetime64): The epoch of the position.
+
+    Returns:
+        tuple: Latitude (deg), longitude (deg) and altitude (km).
+    """
+    ut1 = Time(epoch_dt, scale='utc').ut1
+    c2i = _celestial_to_intermediate_matrix(str(np.datetime64(epoch_dt, 'm')))
+    rotation = erfa.c2tcio(c2i, erfa.era00(ut1.jd1, ut1.jd2), np.identity(3))
+
+    itrs = rotation @ np.array([x, y, z])
+    longitude, latitude, height = erfa.gc2gd(1, itrs * 1000)
+    return math.degrees(latitude), math.degrees(longitude), float(height) / 1000
+
+@contextlib.contextmanager
+def _open_geocache():
+    """
+    Opens the on-disk geocode cache. SQLite in WAL mode lets every gunicorn worker process read
+    and write the same file safely; each call gets its own connection, committed on success.
+    """
+    conn = sqlite3.connect(GEOCACHE_PATH, timeout=5)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS geocache (key TEXT PRIMARY KEY, geolocation TEXT NOT NULL)')
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+@functools.lru_cache(maxsize=4096)
+def _reverse(latitude: float, longitude: float) -> str:
+    """
+    Reverse geocodes a grid point, checking the on-disk cache before asking Nominatim.
+    """
+    key = f'{latitude:.2f},{longitude:.2f}'
+    try:
+        with _open_geocache() as conn:
+            row = conn.execute('SELECT geolocation FROM geocache WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            return row[0]
+    except sqlite3.Error:
+        logger.exception("Could not read the geocode cache")
+
+    geoloc = str(_geocoder.reverse((latitude, longitude), zoom=15, language='en'))
+
+    try:
+        with _open_geocache() as conn:
+            conn.execute('INSERT OR REPLACE INTO geocache (key, geolocation) VALUES (?, ?)', (key, geoloc))
+    except sqlite3.Error:
+        logger.exception("Could not write the geocode cache")
+    return geoloc
+
+def reverse_geocode(latitude: float, longitude: float) -> str:
+    """
+    Looks up the place name for a latitude and longitude.
+
+    Results are cached in memory and on disk per GEOCODE_GRID_DEGREES grid cell, so repeated
+    and nearby positions do not trigger another request to Nominatim.
+
+    Args:
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+
+    Returns:
+        str: The geolocation string returned by Nominatim.
     """
-    full_data_dicts = parse_xml_data(xml_data)
-    state_vector = full_data_dicts['ndm']['oem']['body']['segment']['data']['stateVector']
-    return state_vector
+    grid_latitude = round(round(latitude / GEOCODE_GRID_DEGREES) * GEOCODE_GRID_DEGREES, 2)
+    grid_longitude = round(round(longitude / GEOCODE_GRID_DEGREES) * GEOCODE_GRID_DEGREES, 2)
+    return _reverse(grid_latitude, grid_longitude)
 
 def get_location_info(epoch: str) -> dict:
     """
@@ -93,37 +635,41 @@ def get_location_info(epoch: str) -> dict:
     Returns:
         dict: A dictionary containing the latitude, longitude, altitude, and geolocation information.
     """
-    data = extract_state_vector(fetch_iss_data())
-    sv = None
-    for item in data:
-        if item["EPOCH"] == epoch:
-            sv = item
+    iss_data = fetch_iss_data()
+    index = find_epoch_index(iss_data, epoch)
 
-    if sv is None:
+    if index is None:
         return "Epoch not found, please enter a valid epoch value"
 
-    x = float(sv['X']['#text'])
-    y = float(sv['Y']['#text'])
-    z = float(sv['Z']['#text'])
+    return record_location(extract_state_vector(iss_data)[index])
 
-    this_epoch = time.strftime('%Y-%m-%d %H:%M:%S', time.strptime(sv['EPOCH'][:-5], '%Y-%jT%H:%M:%S'))
+def record_location(record: np.void) -> dict:
+    """
+    Reads the latitude, longitude and altitude of a state vector record and adds its geolocation.
 
-    cartrep = coord.CartesianRepresentation([x, y, z], unit=u.km)
-    gcrs = coord.GCRS(cartrep, obstime=this_epoch)
-    itrs = gcrs.transform_to(coord.ITRS(obstime=this_epoch))
-    loc = coord.EarthLocation(*itrs.cartesian.xyz)
-    latitude = loc.lat.value
-    longitude = loc.lon.value
-    altitude = loc.height.value
+    Args:
+        record (np.void): A single record of the table returned by extract_state_vector.
 
-    geocoder = Nominatim(user_agent='iss_tracker')
-    geoloc = geocoder.reverse((latitude, longitude), zoom=15, language='en')
+    Returns:
+        dict: A dictionary containing the latitude, longitude, altitude, and geolocation information.
+    """
+    if not np.isnan(record['latitude']):
+        # str() gives the shortest decimal that round-trips in float32, so the
+        # response does not carry the spurious digits of a float64 widening.
+        latitude = float(str(record['latitude']))
+        longitude = float(str(record['longitude']))
+        altitude = float(str(record['altitude']))
+    else:
+        latitude, longitude, altitude = _locate(float(record['X']), float(record['Y']), float(record['Z']),
+                                                record['epoch_dt'])
+
+    geoloc = reverse_geocode(latitude, longitude)
 
     response_data = {
         'latitude': latitude,
         'longitude': longitude,
         'altitude': altitude,
-        'geolocation': str(geoloc)
+        'geolocation': geoloc
     }
 
     return response_data
@@ -140,16 +686,14 @@ def epoch_speed(epoch: str) -> str:
         str: The speed of the ISS for the specified epoch, or an error message if the epoch was not found.
     """
 
-    data = extract_state_vector(fetch_iss_data())
-    for item in data:
-        if item["EPOCH"] == epoch:
-            x_velocity = float(item['X_DOT']['#text'])
-            y_velocity = float(item['Y_DOT']['#text'])
-            z_velocity = float(item['Z_DOT']['#text'])
-            speed = calculate_speed(x_velocity, y_velocity, z_velocity)
-            return str(speed)
+    iss_data = fetch_iss_data()
+    index = find_epoch_index(iss_data, epoch)
+
+    if index is None:
+        return "Epoch not found"
 
-    return "Epoch not found"
+    speed = float(extract_state_vector(iss_data)[index]['speed'])
+    return str(speed)
 
 def closest_datapoint_to_now(iss_data: bytes, current_date_and_time: datetime) -> int:
     """
@@ -162,45 +706,67 @@ def closest_datapoint_to_now(iss_data: bytes, current_date_and_time: datetime) -
     Returns:
         int: The index of the closest data point within the state vector.
     """
-    state_vector = extract_state_vector(iss_data)
+    epochs_dt = extract_state_vector(iss_data)['epoch_dt']
+    if epochs_dt.size == 0:
+        return None
 
-    year_first_day = datetime(current_date_and_time.year, 1, 1)
-    current_date = current_date_and_time.date()
-    current_hour = int(str(current_date_and_time)[11:13])
-    current_min = int(str(current_date_and_time)[14:16])
+    return int(np.argmin(np.abs(epochs_dt - np.datetime64(current_date_and_time, 's'))))
 
-    days_since_start_of_year = int((current_date_and_time - year_first_day).days)
-    current_day = days_since_start_of_year + 1
+def _stream_rows(state_vector: np.ndarray, indices: range):
+    """
+    Yields a JSON array of the selected state vectors one row at a time, so the full
+    response is never held in memory.
+    """
+    yield b'['
+    for position, index in enumerate(indices):
+        if position:
+            yield b','
+        yield orjson.dumps(state_vector_row(state_vector, index))
+    yield b']'
 
-    list_of_minutes = []
-    
-    for instance in state_vector:
-        epoch_string = instance['EPOCH']
-        day_number = int(epoch_string[5:8])
-        hour = int(epoch_string[9:11])
-        minute = int(epoch_string[12:14])
 
-        if day_number == current_day:
-            if hour == current_hour:
-                list_of_minutes.append({'minute_val':minute, 'index':state_vector.index(instance)})
+'''
+Routes:
+'''
 
-    closest_value_index = None
-    min_difference = float('inf')
+# Routes whose output depends on the current time rather than only on the OEM file.
+_TIME_DEPENDENT_ENDPOINTS = {'get_now_info'}
 
-    for value in list_of_minutes:
-        min_in_list = value['minute_val']
-        index_of_min_in_list = value['index']
-        difference = abs(min_in_list - current_min)
-        if difference < min_difference:
-            min_difference = difference
-            closest_value_index = index_of_min_in_list
+@app.before_request
+def check_not_modified():
+    '''
+    Answers conditional requests with 304 when the client already has the current OEM data.
+    '''
+    if request.endpoint is None or request.endpoint in _TIME_DEPENDENT_ENDPOINTS:
+        return None
 
-    return closest_value_index
+    fetch_iss_data()
+    cache = _current_snapshot()
+    g.upstream_etag = unquote_etag(cache['etag'])[0] if cache['etag'] else None
+    g.upstream_last_modified = cache['last_modified']
 
+    if g.upstream_etag is not None and request.if_none_match.contains_weak(g.upstream_etag):
+        return Response(status=304)
+    return None
 
-'''
-Routes:
-'''
+@app.after_request
+def add_cache_headers(response):
+    '''
+    Lets clients and proxies cache responses for as long as the OEM data stays current.
+    '''
+    if request.endpoint in _TIME_DEPENDENT_ENDPOINTS:
+        response.headers['Cache-Control'] = 'no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
+
+    if response.status_code not in (200, 304) or g.get('upstream_etag') is None:
+        return response
+
+    response.set_etag(g.upstream_etag, weak=True)
+    if g.upstream_last_modified is not None:
+        response.headers['Last-Modified'] = g.upstream_last_modified
+    response.headers['Cache-Control'] = f'public, max-age={CACHE_TTL_SECONDS}'
+    return response
 
 @app.route('/epochs', methods=['GET'])
 def get_epochs():
@@ -211,7 +777,7 @@ def get_epochs():
         limit (int): The maximum number of data points to be returned (default is the length of the data).
     """
 
-    data = extract_state_vector(fetch_iss_data())
+    state_vector = extract_state_vector(fetch_iss_data())
     
     offset = request.args.get('offset', 0)
     try:
@@ -219,46 +785,39 @@ def get_epochs():
     except ValueError:
         return "Invalid start parameter; start must be an integer.\n"
 
-    limit = request.args.get('limit', len(data))
+    limit = request.args.get('limit', len(state_vector))
 
     try:
         limit = int(limit)
     except ValueError:
         return "Invalid limit parameter; limit must be an integer.\n"
     
-    result = []
-    for item in data[offset:offset+limit]:
-        result.append(item)
-    
-    return jsonify(result)
+    indices = range(len(state_vector))[offset:offset+limit]
+    return Response(_stream_rows(state_vector, indices), mimetype='application/json')
 
 @app.route('/comment', methods=['GET'])
 def get_comment():
     '''
     Prints comment string from data
     '''
-    full_data_dicts = parse_xml_data(fetch_iss_data())
-    comment = full_data_dicts['ndm']['oem']['body']['segment']['data']['COMMENT']
-    return comment
+    comment = _load_sections(fetch_iss_data())['comment_json']
+    return Response(comment, mimetype='application/json')
 
 @app.route('/header', methods=['GET'])
 def get_header():
     '''
     Prints header string
     '''
-    
-    full_data_dicts = parse_xml_data(fetch_iss_data())
-    header = full_data_dicts['ndm']['oem']['header']
-    return header
+    header = _load_sections(fetch_iss_data())['header_json']
+    return Response(header, mimetype='application/json')
 
 @app.route('/metadata', methods=['GET'])
 def get_metadata():
     '''
     Prints metadata string
     '''
-    full_data_dicts = parse_xml_data(fetch_iss_data())
-    metadata = full_data_dicts['ndm']['oem']['body']['segment']['metadata']
-    return metadata
+    metadata = _load_sections(fetch_iss_data())['metadata_json']
+    return Response(metadata, mimetype='application/json')
 
 @app.route('/epochs/<epoch>', methods=['GET'])
 def get_specific_epoch(epoch):
@@ -266,12 +825,13 @@ def get_specific_epoch(epoch):
     Retrieves ISS coordinates data for a specific epoch.
     """
 
-    data = extract_state_vector(fetch_iss_data())
-    for item in data:
-        if item["EPOCH"] == epoch:
-            return jsonify(item)
+    iss_data = fetch_iss_data()
+    index = find_epoch_index(iss_data, epoch)
+
+    if index is None:
+        return "Epoch not found"
 
-    return "Epoch not found"
+    return jsonify(state_vector_row(extract_state_vector(iss_data), index))
 
 @app.route('/epochs/<epoch>/speed', methods=['GET'])
 def get_epoch_speed(epoch):
@@ -301,16 +861,10 @@ def get_now_info():
     current_date_and_time = datetime.now()
 
     closest_value_index = closest_datapoint_to_now(iss_data, current_date_and_time)
-    state_vector = extract_state_vector(fetch_iss_data())
-
-    x_dot_inst = float(state_vector[closest_value_index]['X_DOT']['#text'])
-    y_dot_inst = float(state_vector[closest_value_index]['Y_DOT']['#text'])
-    z_dot_inst = float(state_vector[closest_value_index]['Z_DOT']['#text'])
-
-    speed_inst = str(calculate_speed(x_dot_inst, y_dot_inst, z_dot_inst))
-    specific_epoch = str(state_vector[closest_value_index]['EPOCH'])
+    record = extract_state_vector(iss_data)[closest_value_index]
 
-    location = get_location_info(specific_epoch)
+    speed_inst = str(float(record['speed']))
+    location = record_location(record)
     
     all_info = {'instantaneous_speed': speed_inst, **location}
     
@@ -322,5 +876,6 @@ logging.basicConfig(level='INFO')
 logger = logging.getLogger(__name__)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    start_refresher()
+    app.run(host='0.0.0.0', threaded=True)
 
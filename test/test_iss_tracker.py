@@ -1,9 +1,30 @@
 import unittest
 import pytest
 import requests
+import os
+import tempfile
+import threading
+import time
+import httpx
+import numpy as np
+import orjson
 from datetime import datetime
+from unittest.mock import MagicMock, patch
+import iss_tracker
 from iss_tracker import calculate_speed, closest_datapoint_to_now, epoch_speed, extract_state_vector, get_location_info
 
+SAMPLE_XML = b"<?xml version='1.0' encoding='UTF-8'?><ndm><oem><header><CREATION_DATE>2022-079T00:00:00.000Z</CREATION_DATE><ORIGINATOR>JSC</ORIGINATOR></header><body><segment><metadata><OBJECT_NAME>ISS</OBJECT_NAME></metadata><data><COMMENT>Units are in kg and m^2</COMMENT><stateVector><EPOCH>2022-079T12:00:00.000Z</EPOCH><X units='km'>-4000.0</X><Y units='km'>4000.5</Y><Z units='km'>3000.25</Z><X_DOT units='km/s'>-4.9</X_DOT><Y_DOT units='km/s'>-1.3</Y_DOT><Z_DOT units='km/s'>-5.5</Z_DOT></stateVector><stateVector><EPOCH>2022-079T12:04:00.000Z</EPOCH><X units='km'>-5250.5</X><Y units='km'>2000.0</Y><Z units='km'>3800.75</Z><X_DOT units='km/s'>-3.1</X_DOT><Y_DOT units='km/s'>-5.2</Y_DOT><Z_DOT units='km/s'>-3.9</Z_DOT></stateVector><stateVector><EPOCH>2022-079T12:08:00.000Z</EPOCH><X units='km'>-6100.0</X><Y units='km'>-400.25</Y><Z units='km'>2900.5</Z><X_DOT units='km/s'>-0.4</X_DOT><Y_DOT units='km/s'>-6.6</Y_DOT><Z_DOT units='km/s'>-2.8</Z_DOT></stateVector></data></segment></body></oem></ndm>"
+
+def stub_upstream(xml_data, etag='"v1"'):
+    """
+    Serves xml_data in place of the NASA download, starting from an empty cache.
+    """
+    response = MagicMock(status_code=200, content=xml_data,
+                         headers={'ETag': etag, 'Last-Modified': 'Sun, 20 Mar 2022 00:00:00 GMT'})
+    empty_cache = dict.fromkeys(iss_tracker._CACHE)
+    empty_cache['fetched_at'] = 0
+    return patch.multiple(iss_tracker, _http=MagicMock(**{'get.return_value': response}), _CACHE=empty_cache)
+
 class TestISSFunctions(unittest.TestCase):
 
     def test_calculate_speed(self):
@@ -35,6 +56,109 @@ class TestISSFunctions(unittest.TestCase):
         result = closest_datapoint_to_now(fetch_iss_data(), current_date_and_time)
         self.assertEqual(result, 0)
 
+    def test_closest_datapoint_to_now_across_hours(self):
+        xml_data = b"<?xml version='1.0' encoding='UTF-8'?><ndm><oem><body><segment><data><stateVector><EPOCH>2022-079T12:20:00.000Z</EPOCH><X>1.0</X><Y>2.0</Y><Z>3.0</Z><X_DOT>4.0</X_DOT><Y_DOT>5.0</Y_DOT><Z_DOT>6.0</Z_DOT></stateVector><stateVector><EPOCH>2022-079T13:02:00.000Z</EPOCH><X>1.0</X><Y>2.0</Y><Z>3.0</Z><X_DOT>4.0</X_DOT><Y_DOT>5.0</Y_DOT><Z_DOT>6.0</Z_DOT></stateVector></data></segment></body></oem></ndm>"
+        current_date_and_time = datetime(2022, 3, 20, 12, 58, 0)
+        result = closest_datapoint_to_now(xml_data, current_date_and_time)
+        self.assertEqual(result, 1)
+
+    def test_epoch_speed_keeps_full_precision(self):
+        with stub_upstream(SAMPLE_XML):
+            speed = epoch_speed('2022-079T12:04:00.000Z')
+        self.assertAlmostEqual(float(speed), calculate_speed(-3.1, -5.2, -3.9), places=12)
+
+    def test_locate_matches_compute_locations(self):
+        x = np.array([-4000.0, -5250.5, 6790.0])
+        y = np.array([4000.5, 2000.0, -120.0])
+        z = np.array([3000.25, 3800.75, -15.5])
+        epochs_dt = np.array(['2022-03-20T12:00:00', '2022-03-20T12:04:00', '2022-03-20T12:07:30'],
+                             dtype='M8[s]')
+        latitudes, longitudes, altitudes = iss_tracker._compute_locations(x, y, z, epochs_dt)
+        for i in range(len(x)):
+            latitude, longitude, altitude = iss_tracker._locate(x[i], y[i], z[i], epochs_dt[i])
+            # _locate neglects polar motion, which is about 1e-4 degrees at the ISS.
+            self.assertAlmostEqual(latitude, latitudes[i], delta=1e-3)
+            self.assertAlmostEqual(longitude, longitudes[i], delta=1e-3)
+            self.assertAlmostEqual(altitude, altitudes[i], delta=0.05)
+
+class TestISSHelpers(unittest.TestCase):
+
+    def test_find_epoch_index(self):
+        self.assertEqual(iss_tracker.find_epoch_index(SAMPLE_XML, '2022-079T12:04:00.000Z'), 1)
+        self.assertIsNone(iss_tracker.find_epoch_index(SAMPLE_XML, '2022-079T12:05:00.000Z'))
+
+    def test_state_vector_row(self):
+        row = iss_tracker.state_vector_row(extract_state_vector(SAMPLE_XML), 2)
+        self.assertEqual(row, {'EPOCH': '2022-079T12:08:00.000Z', 'X': -6100.0, 'Y': -400.25, 'Z': 2900.5,
+                               'X_DOT': -0.4, 'Y_DOT': -6.6, 'Z_DOT': -2.8})
+
+    @patch('iss_tracker.reverse_geocode', return_value='somewhere')
+    def test_record_location(self, mock_reverse_geocode):
+        table = extract_state_vector(SAMPLE_XML).copy()
+        result = iss_tracker.record_location(table[0])
+        self.assertEqual(result['latitude'], float(str(table[0]['latitude'])))
+        self.assertEqual(result['longitude'], float(str(table[0]['longitude'])))
+        self.assertEqual(result['altitude'], float(str(table[0]['altitude'])))
+        self.assertEqual(result['geolocation'], 'somewhere')
+        mock_reverse_geocode.assert_called_once_with(result['latitude'], result['longitude'])
+
+        table['latitude'][1] = np.nan
+        result = iss_tracker.record_location(table[1])
+        expected = iss_tracker._locate(-5250.5, 2000.0, 3800.75, table[1]['epoch_dt'])
+        self.assertEqual((result['latitude'], result['longitude'], result['altitude']), expected)
+
+    def test_read_oem_sections_match_xmltodict(self):
+        xml_data = SAMPLE_XML.replace(b'<COMMENT>', b'<COMMENT>MASS=459325.00</COMMENT><COMMENT/><COMMENT>', 1)
+        for data in (SAMPLE_XML, xml_data):
+            oem = iss_tracker.parse_xml_data(data)['ndm']['oem']
+            sections = iss_tracker._read_oem(data)[0]
+            self.assertEqual(sections, {'header': oem['header'], 'metadata': oem['body']['segment']['metadata'],
+                                        'COMMENT': oem['body']['segment']['data']['COMMENT']})
+
+    def test_parse_without_lxml_matches_lxml(self):
+        expected = iss_tracker._parse_to_table(SAMPLE_XML)
+        with patch('iss_tracker.etree', None):
+            result = iss_tracker._parse_to_table(SAMPLE_XML)
+        np.testing.assert_array_equal(result['table'], expected['table'])
+        self.assertEqual(result['epoch_index'], expected['epoch_index'])
+        for key in ('comment_json', 'header_json', 'metadata_json'):
+            self.assertEqual(result[key], expected[key])
+
+    def test_reverse_geocode_snaps_to_grid(self):
+        with patch('iss_tracker._reverse', return_value='somewhere') as mock_reverse:
+            self.assertEqual(iss_tracker.reverse_geocode(51.6374, -0.0212), 'somewhere')
+            mock_reverse.assert_called_with(51.65, 0.0)
+            iss_tracker.reverse_geocode(-33.874, 179.99)
+            mock_reverse.assert_called_with(-33.85, 180.0)
+
+    def test_reverse_geocode_uses_disk_cache(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('iss_tracker.GEOCACHE_PATH', os.path.join(tmp, 'geocache.db')), \
+                patch('iss_tracker._geocoder') as mock_geocoder:
+            mock_geocoder.reverse.return_value = 'Pacific Ocean'
+            iss_tracker._reverse.cache_clear()
+            self.assertEqual(iss_tracker.reverse_geocode(10.01, -150.02), 'Pacific Ocean')
+            self.assertEqual(iss_tracker.reverse_geocode(9.99, -149.98), 'Pacific Ocean')
+            iss_tracker._reverse.cache_clear()
+            self.assertEqual(iss_tracker.reverse_geocode(10.0, -150.0), 'Pacific Ocean')
+            mock_geocoder.reverse.assert_called_once_with((10.0, -150.0), zoom=15, language='en')
+        iss_tracker._reverse.cache_clear()
+
+    def test_stream_rows_offset_and_limit(self):
+        iss_tracker.app.testing = True
+        client = iss_tracker.app.test_client()
+        with stub_upstream(SAMPLE_XML):
+            epochs = [row['EPOCH'] for row in client.get('/epochs?offset=1&limit=1').json]
+            self.assertEqual(epochs, ['2022-079T12:04:00.000Z'])
+            epochs = [row['EPOCH'] for row in client.get('/epochs?offset=1').json]
+            self.assertEqual(epochs, ['2022-079T12:04:00.000Z', '2022-079T12:08:00.000Z'])
+            self.assertEqual(client.get('/epochs?offset=5&limit=2').json, [])
+
+        state_vector = extract_state_vector(SAMPLE_XML)
+        body = b''.join(iss_tracker._stream_rows(state_vector, range(3)[0:2]))
+        self.assertEqual(orjson.loads(body), [iss_tracker.state_vector_row(state_vector, 0),
+                                              iss_tracker.state_vector_row(state_vector, 1)])
+
 class TestISSRoutes(unittest.TestCase):
 
     def setUp(self):
@@ -92,6 +216,138 @@ class TestISSRoutes(unittest.TestCase):
         self.assertIn('altitude', response.json)
         self.assertIn('geolocation', response.json)
 
+class TestISSCacheHeaders(unittest.TestCase):
+
+    def setUp(self):
+        iss_tracker.app.testing = True
+        self.app = iss_tracker.app.test_client()
+
+    def test_cache_headers_and_not_modified(self):
+        with stub_upstream(SAMPLE_XML):
+            response = self.app.get('/header')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['ETag'], 'W/"v1"')
+            self.assertEqual(response.headers['Cache-Control'], 'public, max-age=60')
+            self.assertEqual(response.headers['Last-Modified'], 'Sun, 20 Mar 2022 00:00:00 GMT')
+
+            response = self.app.get('/epochs/2022-079T12:04:00.000Z', headers={'If-None-Match': 'W/"v1"'})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+
+            response = self.app.get('/header', headers={'If-None-Match': '"v0"'})
+            self.assertEqual(response.status_code, 200)
+
+    def test_now_is_not_cached_with_upstream_etag(self):
+        with stub_upstream(SAMPLE_XML), patch('iss_tracker.reverse_geocode', return_value='somewhere'):
+            response = self.app.get('/now')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            self.assertNotIn('v1', response.headers['ETag'])
+
+            response = self.app.get('/now', headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+
+    def test_body_matches_etag_when_data_is_swapped_mid_request(self):
+        newer = MagicMock(status_code=200, content=SAMPLE_XML.replace(b'12:04:00', b'12:05:00'),
+                          headers={'ETag': '"v2"'})
+        with stub_upstream(SAMPLE_XML):
+            get_specific_epoch = iss_tracker.app.view_functions['get_specific_epoch']
+
+            def refresh_then_route(epoch):
+                iss_tracker._http.get.return_value = newer
+                iss_tracker._refresh_cache()
+                return get_specific_epoch(epoch)
+
+            with patch.dict(iss_tracker.app.view_functions, {'get_specific_epoch': refresh_then_route}):
+                response = self.app.get('/epochs/2022-079T12:04:00.000Z')
+            self.assertEqual(response.headers['ETag'], 'W/"v1"')
+            self.assertEqual(response.json['EPOCH'], '2022-079T12:04:00.000Z')
+
+class TestISSDataCache(unittest.TestCase):
+
+    def setUp(self):
+        iss_tracker.app.testing = True
+        self.app = iss_tracker.app.test_client()
+
+    def expire_cache(self):
+        iss_tracker._CACHE = {**iss_tracker._CACHE, 'fetched_at': time.monotonic() - 2 * iss_tracker.CACHE_TTL_SECONDS}
+
+    def test_malformed_download_keeps_cached_copy(self):
+        with stub_upstream(SAMPLE_XML):
+            xml_data = iss_tracker.fetch_iss_data()
+            iss_tracker._http.get.return_value = MagicMock(status_code=200, content=b'<ndm><oem',
+                                                           headers={'ETag': '"v2"'})
+            self.expire_cache()
+
+            response = self.app.get('/header')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['ETag'], 'W/"v1"')
+            self.assertIs(iss_tracker._CACHE['xml'], xml_data)
+            self.assertIsNotNone(iss_tracker._CACHE['failed_at'])
+
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_count, 2)
+
+    def test_revalidates_with_conditional_get(self):
+        with stub_upstream(SAMPLE_XML):
+            xml_data = iss_tracker.fetch_iss_data()
+            iss_tracker._http.get.return_value = MagicMock(status_code=304, content=b'', headers={})
+            self.expire_cache()
+
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_args.kwargs['headers'],
+                             {'If-None-Match': '"v1"', 'If-Modified-Since': 'Sun, 20 Mar 2022 00:00:00 GMT'})
+            self.assertIs(iss_tracker._CACHE['xml'], xml_data)
+            self.assertEqual(iss_tracker._CACHE['etag'], '"v1"')
+
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_count, 2)
+
+    def test_no_upstream_call_within_ttl(self):
+        with stub_upstream(SAMPLE_XML):
+            xml_data = iss_tracker.fetch_iss_data()
+            for url in ('/header', '/epochs', '/epochs/2022-079T12:04:00.000Z/speed'):
+                self.assertEqual(self.app.get(url).status_code, 200)
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_count, 1)
+            self.assertEqual(iss_tracker._http.get.call_args.kwargs['headers'], {})
+
+    def test_backs_off_after_failed_fetch(self):
+        with stub_upstream(SAMPLE_XML):
+            xml_data = iss_tracker.fetch_iss_data()
+
+            iss_tracker._http.get.return_value = MagicMock(status_code=503, content=b'', headers={})
+            self.expire_cache()
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_count, 2)
+
+            iss_tracker._http.get.side_effect = httpx.ConnectError('unreachable')
+            iss_tracker._CACHE = {**iss_tracker._CACHE, 'failed_at': None}
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertIs(iss_tracker.fetch_iss_data(), xml_data)
+            self.assertEqual(iss_tracker._http.get.call_count, 3)
+
+            # Once the backoff has passed the next request tries again
+            iss_tracker._CACHE = {**iss_tracker._CACHE,
+                                  'failed_at': time.monotonic() - iss_tracker.FAILURE_BACKOFF_SECONDS}
+            iss_tracker.fetch_iss_data()
+            self.assertEqual(iss_tracker._http.get.call_count, 4)
+
+    def test_request_does_not_wait_for_running_refresh(self):
+        with stub_upstream(SAMPLE_XML):
+            iss_tracker.fetch_iss_data()
+            self.expire_cache()
+            responses = []
+            with iss_tracker._refresh_lock:
+                thread = threading.Thread(target=lambda: responses.append(self.app.get('/header')))
+                thread.start()
+                thread.join(timeout=5)
+                self.assertFalse(thread.is_alive())
+            self.assertEqual(responses[0].status_code, 200)
+            self.assertEqual(responses[0].headers['ETag'], 'W/"v1"')
+            self.assertEqual(iss_tracker._http.get.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+'''
+WSGI entry point for serving the ISS tracker with gunicorn (see gunicorn.conf.py).
+'''
+
+from iss_tracker import app, fetch_iss_data
+
+# Load and parse the OEM data up front. With preload_app the workers are forked
+# after this runs, so each one starts with the parsed data already in memory.
+# fetch_iss_data logs and swallows a failed download itself.
+fetch_iss_data()